@@ -629,11 +629,11 @@ app.listen(PORT, () => {
   // Wake up Flask API server
   (async () => {
     try {
-      const res = await fetch(`https://flask-api-nhm2.onrender.com/api/market-status`);
+      const res = await fetch(`https://flask-api-nhm2.onrender.com/api/ready`);
       if (res.ok) {
         console.log('✅ Flask API woke up successfully');
       } else {
-        console.warn(`⚠️ Flask API wake-up ping returned ${res.status} [500 = Market Closed]`);
+        console.warn(`⚠️ Flask API wake-up ping returned ${res.status} [503 = Still warming up]`);
       }
     } catch (err) {
       console.error('❌ Error pinging Flask API to wake it up:', err.message);
@@ -57,9 +57,26 @@ CREATE TABLE watchlist_items (
     PRIMARY KEY (watchlist_id, stock_id)
 );
 
+-- Create orders table (Resting limit/stop orders, filled by the stock API's order engine)
+CREATE TABLE orders (
+    order_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    stock_id UUID NOT NULL REFERENCES stocks(stock_id) ON DELETE CASCADE,
+    side VARCHAR(4) NOT NULL CHECK (side IN ('BUY', 'SELL')),
+    order_type VARCHAR(5) NOT NULL CHECK (order_type IN ('LIMIT', 'STOP')),
+    quantity DECIMAL(15,4) NOT NULL CHECK (quantity > 0),
+    trigger_price DECIMAL(15,2) NOT NULL CHECK (trigger_price > 0),
+    status VARCHAR(9) NOT NULL DEFAULT 'OPEN' CHECK (status IN ('OPEN', 'FILLED', 'CANCELLED', 'REJECTED')),
+    filled_price DECIMAL(15,2),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    filled_at TIMESTAMP WITH TIME ZONE
+);
+
 -- Indexes for better query performance
 CREATE INDEX idx_holdings_user_id ON holdings(user_id);
 CREATE INDEX idx_transactions_user_id ON transactions(user_id);
+CREATE INDEX idx_orders_user_id ON orders(user_id);
+CREATE INDEX idx_orders_open ON orders(status) WHERE status = 'OPEN';
 CREATE INDEX idx_watchlist_items_watchlist_id ON watchlist_items(watchlist_id);
 CREATE INDEX idx_stocks_symbol ON stocks(symbol);
 CREATE INDEX idx_stocks_search ON stocks (LOWER(symbol), LOWER(company_name));
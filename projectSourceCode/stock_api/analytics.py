@@ -0,0 +1,297 @@
+"""
+Offline analytics over trading activity.
+
+Bulk-exports the transactions / holdings tables (plus daily close history for
+every traded symbol) to Parquet with COPY ... TO STDOUT, then computes
+per-user and per-symbol statistics with vectorized pandas/NumPy.
+
+This never runs inside the Flask request path. Run it from cron or by hand:
+
+    python3 stock_api/analytics.py export --out analytics_data
+    python3 stock_api/analytics.py report --data analytics_data
+
+analytics_data/ is git-ignored.
+"""
+import argparse
+import logging
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Every account starts with this much cash (users.balance default)
+INITIAL_BALANCE = 10000.0
+TRADING_DAYS = 252
+
+EXPORT_QUERIES = {
+    'transactions': """
+        SELECT t.transaction_id, t.user_id, s.symbol, t.transaction_type,
+               t.quantity, t.price, t.transaction_date
+        FROM transactions t
+        JOIN stocks s ON t.stock_id = s.stock_id
+    """,
+    'holdings': """
+        SELECT h.user_id, s.symbol, h.quantity, s.last_price
+        FROM holdings h
+        JOIN stocks s ON h.stock_id = s.stock_id
+    """,
+}
+
+# Explicit Arrow types for each export. Without them open_csv infers types
+# from the first block only, so a column that starts out NULL becomes `null`
+# and fails later, and DECIMAL columns lose precision as float64.
+EXPORT_COLUMN_TYPES = {
+    'transactions': {
+        'transaction_id': pa.string(),
+        'user_id': pa.string(),
+        'symbol': pa.string(),
+        'transaction_type': pa.string(),
+        'quantity': pa.decimal128(15, 4),
+        'price': pa.decimal128(15, 2),
+        'transaction_date': pa.timestamp('us', tz='UTC'),
+    },
+    'holdings': {
+        'user_id': pa.string(),
+        'symbol': pa.string(),
+        'quantity': pa.decimal128(15, 4),
+        'last_price': pa.decimal128(15, 2),
+    },
+}
+
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=os.getenv('PGHOST'),
+        database=os.getenv('POSTGRES_DB'),
+        user=os.getenv('POSTGRES_USER'),
+        password=os.getenv('POSTGRES_PASSWORD')
+    )
+
+
+def copy_to_parquet(conn, query, path, column_types=None):
+    """
+    Stream a query out with COPY ... TO STDOUT and write it as Parquet.
+
+    The CSV is spooled to a temp file and converted batch by batch, so only
+    one batch is held in memory at a time.
+    """
+    rows = 0
+    with tempfile.TemporaryFile() as spool:
+        cur = conn.cursor()
+        try:
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", spool)
+        finally:
+            cur.close()
+        spool.seek(0)
+
+        reader = pa_csv.open_csv(
+            spool, convert_options=pa_csv.ConvertOptions(column_types=column_types or {})
+        )
+        with pq.ParquetWriter(path, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    return rows
+
+
+def export_price_history(symbols, start, path):
+    """Download daily closes for the traded symbols into a wide Parquet file"""
+    import yfinance as yf
+
+    if not symbols:
+        pd.DataFrame().to_parquet(path)
+        return 0
+    data = yf.download(sorted(symbols), start=start, interval='1d',
+                       auto_adjust=False, progress=False, group_by='column')
+    closes = data['Close']
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(name=sorted(symbols)[0])
+    closes.index = pd.to_datetime(closes.index).tz_localize(None).normalize()
+    closes.columns.name = 'symbol'
+    closes.to_parquet(path)
+    return len(closes)
+
+
+def export_all(out_dir):
+    """Export transactions, holdings and price history into out_dir"""
+    os.makedirs(out_dir, exist_ok=True)
+    conn = get_db_connection()
+    try:
+        for name, query in EXPORT_QUERIES.items():
+            rows = copy_to_parquet(conn, query, os.path.join(out_dir, f'{name}.parquet'),
+                                   EXPORT_COLUMN_TYPES[name])
+            print(f"Exported {rows} rows from {name}")
+    finally:
+        conn.close()
+
+    tx = pd.read_parquet(os.path.join(out_dir, 'transactions.parquet'),
+                         columns=['symbol', 'transaction_date'])
+    if tx.empty:
+        start = None
+        symbols = []
+    else:
+        start = pd.to_datetime(tx['transaction_date'], utc=True).min().date().isoformat()
+        symbols = tx['symbol'].unique().tolist()
+    rows = export_price_history(symbols, start, os.path.join(out_dir, 'prices.parquet'))
+    print(f"Exported {rows} days of price history for {len(symbols)} symbols")
+
+
+def load_data(data_dir):
+    transactions = pd.read_parquet(os.path.join(data_dir, 'transactions.parquet'))
+    holdings = pd.read_parquet(os.path.join(data_dir, 'holdings.parquet'))
+    prices = pd.read_parquet(os.path.join(data_dir, 'prices.parquet'))
+    # Parquet keeps the exact DECIMALs; the statistics are float math
+    transactions = transactions.astype({'quantity': float, 'price': float})
+    holdings = holdings.astype({'quantity': float, 'last_price': float})
+    return transactions, holdings, prices
+
+
+def daily_equity(transactions, prices, initial_balance=INITIAL_BALANCE):
+    """
+    Rebuild each user's end-of-day account value (cash + marked positions).
+
+    Returns a DataFrame indexed by date with one column per user. Each user's
+    column is NaN until the session before their first trade, so flat days
+    before they started don't count toward their statistics.
+    """
+    if transactions.empty:
+        return pd.DataFrame()
+
+    tx = transactions.copy()
+    tx['transaction_date'] = pd.to_datetime(tx['transaction_date'], utc=True)
+    tx = tx.sort_values('transaction_date')
+    tx['date'] = tx['transaction_date'].dt.tz_localize(None).dt.normalize()
+    sign = np.where(tx['transaction_type'].to_numpy() == 'BUY', 1.0, -1.0)
+    qty = tx['quantity'].to_numpy(dtype=float)
+    tx['signed_qty'] = sign * qty
+    tx['cash_flow'] = -sign * qty * tx['price'].to_numpy(dtype=float)
+
+    if prices.empty:
+        prices = pd.DataFrame(index=pd.bdate_range(tx['date'].min(), tx['date'].max()))
+    dates = prices.index
+    # Trades that land on a non-trading day count toward the next session
+    tx['date'] = dates[np.minimum(dates.searchsorted(tx['date']), len(dates) - 1)]
+
+    # Positions: dates x (user, symbol), cumulative share count
+    positions = (tx.pivot_table(index='date', columns=['user_id', 'symbol'],
+                                values='signed_qty', aggfunc='sum')
+                   .reindex(dates).fillna(0.0).cumsum())
+
+    # Mark at the daily close; symbols with no closes (delisted, typo) fall back
+    # to their last trade price rather than being valued at zero
+    symbols = tx['symbol'].unique()
+    no_closes = sorted(set(symbols) - set(prices.dropna(axis=1, how='all').columns))
+    if no_closes:
+        logger.warning(f"No price history for {no_closes}, marking at last trade price")
+    trade_marks = (tx.pivot_table(index='date', columns='symbol', values='price', aggfunc='last')
+                     .reindex(dates).ffill())
+    marks = prices.reindex(columns=symbols).ffill().fillna(trade_marks)
+    marks = marks.reindex(columns=positions.columns.get_level_values('symbol'))
+    # Anything still unmarked predates the symbol's first trade, so no shares are held
+    market_value = positions.to_numpy() * marks.fillna(0.0).to_numpy()
+    holdings_value = (pd.DataFrame(market_value, index=dates, columns=positions.columns)
+                        .T.groupby(level='user_id').sum().T)
+
+    cash = (tx.pivot_table(index='date', columns='user_id',
+                           values='cash_flow', aggfunc='sum')
+              .reindex(dates).fillna(0.0).cumsum() + initial_balance)
+
+    equity = cash.add(holdings_value, fill_value=0.0)
+    first_trade = tx.groupby('user_id')['date'].min().reindex(equity.columns)
+    # Keep one session before the first trade as the starting balance
+    start = np.maximum(dates.searchsorted(first_trade.to_numpy()) - 1, 0)
+    active = np.arange(len(dates))[:, None] >= start[None, :]
+    return equity.where(active)
+
+
+def user_performance(equity, periods_per_year=TRADING_DAYS):
+    """Time-weighted return, max drawdown and annualized Sharpe per user"""
+    if equity.empty:
+        return pd.DataFrame(columns=['twr', 'max_drawdown', 'sharpe'])
+
+    # NaN marks days a user wasn't active yet; they are skipped, not zero returns
+    values = equity.to_numpy(dtype=float)
+    returns = values[1:] / values[:-1] - 1.0
+    # No deposits or withdrawals exist, so the TWR is the chained daily return
+    twr = np.nanprod(1.0 + returns, axis=0) - 1.0
+
+    running_peak = np.fmax.accumulate(values, axis=0)
+    with np.errstate(invalid='ignore'):
+        max_drawdown = np.nan_to_num(np.nanmin(values / running_peak - 1.0, axis=0, initial=0.0))
+
+    valid = ~np.isnan(returns)
+    n = valid.sum(axis=0)
+    filled = np.where(valid, returns, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = filled.sum(axis=0) / n
+        var = (np.where(valid, returns - mean, 0.0) ** 2).sum(axis=0) / (n - 1)
+        std = np.sqrt(np.where(n > 1, var, 0.0))
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), np.nan)
+
+    return pd.DataFrame({
+        'twr': twr,
+        'max_drawdown': max_drawdown,
+        'sharpe': sharpe,
+    }, index=equity.columns)
+
+
+def symbol_turnover(transactions, holdings):
+    """Traded notional, trade count, distinct traders and share turnover per symbol"""
+    tx = transactions.assign(
+        notional=transactions['quantity'].astype(float) * transactions['price'].astype(float)
+    )
+    traded = tx.groupby('symbol').agg(
+        trades=('transaction_id', 'size'),
+        traders=('user_id', 'nunique'),
+        shares_traded=('quantity', 'sum'),
+        notional=('notional', 'sum'),
+    )
+    held = holdings.groupby('symbol')['quantity'].sum().rename('shares_held')
+    result = traded.join(held, how='left').fillna({'shares_held': 0.0})
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['turnover'] = np.where(result['shares_held'] > 0,
+                                      result['shares_traded'] / result['shares_held'],
+                                      np.nan)
+    return result.sort_values('notional', ascending=False)
+
+
+def run_report(data_dir, out_dir=None):
+    transactions, holdings, prices = load_data(data_dir)
+    equity = daily_equity(transactions, prices)
+    performance = user_performance(equity)
+    turnover = symbol_turnover(transactions, holdings)
+
+    out_dir = out_dir or data_dir
+    performance.to_parquet(os.path.join(out_dir, 'user_performance.parquet'))
+    turnover.to_parquet(os.path.join(out_dir, 'symbol_turnover.parquet'))
+    print(f"Wrote performance for {len(performance)} users and turnover for {len(turnover)} symbols")
+    return performance, turnover
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline trading analytics")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export = sub.add_parser('export', help='bulk-export tables and price history to Parquet')
+    export.add_argument('--out', default='analytics_data')
+
+    report = sub.add_parser('report', help='compute user performance and symbol turnover')
+    report.add_argument('--data', default='analytics_data')
+    report.add_argument('--out', default=None)
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        export_all(args.out)
+    else:
+        run_report(args.data, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,416 @@
+"""
+Vectorized backtests of simple rule-based strategies.
+
+Daily OHLCV is cached per symbol as Parquet under BACKTEST_CACHE_DIR and only
+downloaded from Yahoo Finance when the cache doesn't cover the requested
+range. Each strategy turns the whole close-price matrix (dates x symbols)
+into a target-weight matrix in one pass, lagged a day so a signal from a
+close is traded at the next close. The simulator only trades on days
+the target changes; in between, share counts are held and the portfolio
+drifts with prices, so each holding period is valued as one matrix product.
+
+Parameter sweeps fan out over one long-lived process pool (forkserver, so
+workers never fork the threaded Flask process), one backtest per parameter
+set. The pool starts on the first sweep that needs it.
+"""
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analytics import TRADING_DAYS, user_performance
+
+
+def _default_workers():
+    # cpu_count() reports the host's CPUs inside a container; affinity is what we may use
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+    # Each worker imports pandas/numpy/pyarrow, so keep small instances small
+    return max(1, min(available, 4))
+
+
+CACHE_DIR = os.getenv('BACKTEST_CACHE_DIR', 'history_cache')
+MAX_WORKERS = int(os.getenv('BACKTEST_WORKERS', str(_default_workers())))
+MAX_SYMBOLS = 200
+MAX_RUNS = 256
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Yahoo tickers: letters/digits plus . - = ^ (BRK-B, ^GSPC, EURUSD=X); no path separators
+SYMBOL_RE = re.compile(r'^[A-Z0-9^][A-Z0-9.=^-]{0,14}$')
+# Parquet schema metadata key holding the date range a cache file covers
+RANGE_KEY = b'backtest_range'
+# yfinance returns an empty frame instead of raising on network errors and rate
+# limits, so "no rows" is only remembered briefly rather than cached as covered
+NO_DATA_TTL = 15 * 60
+_no_data = {}
+
+
+class BacktestError(ValueError):
+    pass
+
+
+# ---------------------------------------------------------------- history cache
+
+def _cache_path(symbol):
+    return os.path.join(CACHE_DIR, f'{symbol}.parquet')
+
+
+def _download(symbols, start, end):
+    import yfinance as yf
+
+    data = yf.download(symbols, start=start.isoformat(), end=(end + timedelta(days=1)).isoformat(),
+                       interval='1d', auto_adjust=True, progress=False, group_by='ticker')
+    frames = {}
+    for symbol in symbols:
+        try:
+            frame = data[symbol] if isinstance(data.columns, pd.MultiIndex) else data
+        except KeyError:
+            continue
+        frame = frame[OHLCV].dropna(how='all')
+        if frame.empty:
+            continue
+        frame.index = pd.to_datetime(frame.index).tz_localize(None).normalize()
+        frames[symbol] = frame
+    return frames
+
+
+def _read_cache(symbol):
+    """Return (frame, (start, end) covered) for a cached symbol, or (None, None)"""
+    path = _cache_path(symbol)
+    if not os.path.exists(path):
+        return None, None
+    table = pq.read_table(path)
+    covered = json.loads((table.schema.metadata or {}).get(RANGE_KEY, b'null'))
+    if covered:
+        covered = (date.fromisoformat(covered[0]), date.fromisoformat(covered[1]))
+    return table.to_pandas(), covered
+
+
+def _write_cache(symbol, frame, covered):
+    """Atomically replace a symbol's cache file, recording the range it covers"""
+    table = pa.Table.from_pandas(frame)
+    metadata = dict(table.schema.metadata or {})
+    metadata[RANGE_KEY] = json.dumps([covered[0].isoformat(), covered[1].isoformat()]).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, _cache_path(symbol))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_history(symbols, start, end):
+    """Return daily OHLCV for symbols over [start, end], filling the cache as needed"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cached = {}
+    stale = {}
+    fetch_end = min(end, date.today())
+
+    now = time.time()
+    for symbol in symbols:
+        frame, covered = _read_cache(symbol)
+        # Covered is the range Yahoo returned rows for, so a symbol that listed
+        # after `start` still counts as cached
+        if covered and covered[0] <= start and covered[1] >= fetch_end:
+            cached[symbol] = frame
+            continue
+        expires, lo, hi = _no_data.get(symbol, (0, None, None))
+        if expires > now and lo <= start and hi >= fetch_end:
+            # Came back empty recently; serve what we have without asking again
+            if frame is not None and not frame.empty:
+                cached[symbol] = frame
+            continue
+        stale[symbol] = (frame, covered)
+
+    if stale:
+        # Widen the download to the old range too so coverage stays contiguous
+        lo = min([start] + [c[0] for _, c in stale.values() if c])
+        hi = max([fetch_end] + [c[1] for _, c in stale.values() if c])
+        downloaded = _download(sorted(stale), lo, hi)
+        for symbol, (old, _) in stale.items():
+            frame = downloaded.get(symbol)
+            if frame is None:
+                # Leave the cache file and its recorded range alone
+                _no_data[symbol] = (now + NO_DATA_TTL, lo, hi)
+                if old is not None and not old.empty:
+                    cached[symbol] = old
+                continue
+            _no_data.pop(symbol, None)
+            if old is not None and not old.empty:
+                frame = pd.concat([old, frame])
+                frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+            _write_cache(symbol, frame, (lo, hi))
+            cached[symbol] = frame
+
+    lo, hi = pd.Timestamp(start), pd.Timestamp(end)
+    return {symbol: frame.loc[lo:hi] for symbol, frame in cached.items() if not frame.loc[lo:hi].empty}
+
+
+def price_matrix(history, field='Close'):
+    """Align one OHLCV field across symbols into a dates x symbols frame"""
+    matrix = pd.DataFrame({symbol: frame[field] for symbol, frame in history.items()})
+    return matrix.sort_index().ffill()
+
+
+# ---------------------------------------------------------------- strategies
+
+def _equal_weight(mask):
+    mask = np.nan_to_num(np.asarray(mask, dtype=float))
+    counts = mask.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, mask / counts, 0.0)
+
+
+def buy_and_hold(close):
+    """Equal weight in every symbol once it has a price"""
+    return _equal_weight(close.notna().to_numpy())
+
+
+def sma_crossover(close, fast=20, slow=50):
+    """Hold a symbol while its fast moving average is above the slow one"""
+    fast, slow = int(fast), int(slow)
+    if fast <= 0 or slow <= fast:
+        raise BacktestError("sma_crossover needs 0 < fast < slow")
+    fast_ma = close.rolling(fast, min_periods=fast).mean().to_numpy()
+    slow_ma = close.rolling(slow, min_periods=slow).mean().to_numpy()
+    with np.errstate(invalid='ignore'):
+        return _equal_weight(fast_ma > slow_ma)
+
+
+def momentum(close, lookback=126, top_n=10, rebalance=21):
+    """Every `rebalance` days, hold the top_n symbols by trailing return"""
+    lookback, top_n, rebalance = int(lookback), int(top_n), int(rebalance)
+    if lookback <= 0 or top_n <= 0 or rebalance <= 0:
+        raise BacktestError("momentum needs positive lookback, top_n and rebalance")
+    trailing = close.pct_change(lookback, fill_method=None).to_numpy()
+    # Rank descending; NaN (not enough history) sorts last and is masked out
+    ranks = np.argsort(np.argsort(-np.nan_to_num(trailing, nan=-np.inf), axis=1), axis=1)
+    mask = (ranks < top_n) & ~np.isnan(trailing)
+
+    # Only change holdings on rebalance days, carry them in between
+    rebalance_days = np.zeros(len(close), dtype=bool)
+    rebalance_days[::rebalance] = True
+    held = pd.DataFrame(np.where(rebalance_days[:, None], mask, np.nan)).ffill().fillna(0)
+    return _equal_weight(held.to_numpy())
+
+
+STRATEGIES = {
+    'buy_and_hold': buy_and_hold,
+    'sma_crossover': sma_crossover,
+    'momentum': momentum,
+}
+
+
+# ---------------------------------------------------------------- simulation
+
+def simulate(close, weights, initial_cash=10000.0, cost_bps=0.0):
+    """
+    Run target weights against close prices.
+
+    The portfolio is rebalanced to the target at the close of every day the
+    target changes. Between those days the share counts are held, so weights
+    drift with prices. Turnover is the gap between the drifted weights and
+    the new target, and trading costs are charged on it.
+    """
+    prices = np.nan_to_num(close.to_numpy(dtype=float))
+    weights = np.asarray(weights, dtype=float)
+    changed = np.abs(np.diff(weights, axis=0, prepend=np.zeros((1, weights.shape[1])))) > 1e-12
+    rebalance_days = np.flatnonzero(changed.any(axis=1))
+
+    equity = np.empty(len(prices))
+    shares = np.zeros(prices.shape[1])
+    cash = float(initial_cash)
+    trades = 0
+    turnover = 0.0
+    prev = 0
+    for day in rebalance_days:
+        # Hold the current shares from the last rebalance up to today
+        equity[prev:day] = cash + prices[prev:day] @ shares
+        value = cash + prices[day] @ shares
+        drifted = prices[day] * shares / value
+        traded = np.abs(weights[day] - drifted).sum()
+        value -= traded * value * cost_bps / 10000.0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            target = np.where(prices[day] > 0, weights[day] * value / prices[day], 0.0)
+        trades += int(np.count_nonzero(np.abs(target - shares) > 1e-9))
+        turnover += traded
+        shares = target
+        cash = value - prices[day] @ shares
+        prev = day
+    equity[prev:] = cash + prices[prev:] @ shares
+
+    return {
+        'equity': pd.Series(equity, index=close.index),
+        'cash': float(cash),
+        'positions': {
+            symbol: round(float(n), 4)
+            for symbol, n in zip(close.columns, shares) if n > 0
+        },
+        'trades': trades,
+        'turnover': float(turnover),
+    }
+
+
+def expand_grid(params):
+    """{'fast': [10, 20], 'slow': 50} -> [{'fast': 10, 'slow': 50}, {'fast': 20, 'slow': 50}]"""
+    keys = sorted(params)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in (params[k] for k in keys)]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the shared worker pool, starting it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                                        mp_context=multiprocessing.get_context('forkserver'))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def pool_status():
+    """Report the shared pool for /api/ready without starting it"""
+    if MAX_WORKERS <= 1:
+        return {"status": "disabled", "max_workers": MAX_WORKERS}
+    return {"status": "idle" if _pool is None else "running", "max_workers": MAX_WORKERS}
+
+
+def check_cache():
+    """Make sure the history cache is writable; returns how many symbols it holds"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with tempfile.TemporaryFile(dir=CACHE_DIR):
+        pass
+    return sum(1 for name in os.listdir(CACHE_DIR) if name.endswith('.parquet'))
+
+
+def target_weights(close, strategy, params):
+    """
+    Strategy weights lagged one day.
+
+    Signals are computed from day t's close, so they can only be traded at
+    day t+1's close; filling on the same close would be look-ahead.
+    """
+    try:
+        signal = STRATEGIES[strategy](close, **params)
+    except BacktestError:
+        raise
+    except (TypeError, ValueError, OverflowError) as e:
+        raise BacktestError(f"Invalid params {params} for {strategy}: {e}")
+    weights = np.zeros_like(signal)
+    weights[1:] = signal[:-1]
+    return weights
+
+
+def _run_one(strategy, params, initial_cash, cost_bps, close):
+    weights = target_weights(close, strategy, params)
+    result = simulate(close, weights, initial_cash, cost_bps)
+    result['params'] = params
+    return result
+
+
+def run_backtest(symbols, start, end, strategy, params=None, initial_cash=10000.0, cost_bps=0.0):
+    """Backtest strategy over symbols for every parameter set in params"""
+    if strategy not in STRATEGIES:
+        raise BacktestError(f"Unknown strategy '{strategy}', expected one of {sorted(STRATEGIES)}")
+    if not all(isinstance(s, str) for s in symbols):
+        raise BacktestError("Symbols must be strings")
+    symbols = sorted({s.strip().upper() for s in symbols if s.strip()})
+    if not symbols or len(symbols) > MAX_SYMBOLS:
+        raise BacktestError(f"Provide between 1 and {MAX_SYMBOLS} symbols")
+    invalid = [s for s in symbols if not SYMBOL_RE.match(s)]
+    if invalid:
+        raise BacktestError(f"Invalid symbols: {invalid}")
+    if not (math.isfinite(initial_cash) and initial_cash > 0):
+        raise BacktestError("initial_cash must be a positive number")
+    if not (math.isfinite(cost_bps) and 0 <= cost_bps < 10000):
+        raise BacktestError("cost_bps must be between 0 and 10000")
+    if start >= end:
+        raise BacktestError("start must be before end")
+    grid = expand_grid(params or {})
+    if not grid:
+        raise BacktestError("params contains an empty list")
+    if len(grid) > MAX_RUNS:
+        raise BacktestError(f"Parameter sweep too large ({len(grid)} runs, max {MAX_RUNS})")
+    # Catch bad parameter values on a dummy matrix before downloading anything
+    probe = pd.DataFrame({'PROBE': [1.0, 1.0]})
+    for p in grid:
+        target_weights(probe, strategy, p)
+
+    close = price_matrix(load_history(symbols, start, end))
+    if len(close) < 2:
+        raise BacktestError("Not enough price history in that range")
+
+    if len(grid) == 1 or MAX_WORKERS <= 1:
+        runs = [_run_one(strategy, p, initial_cash, cost_bps, close) for p in grid]
+    else:
+        pool = get_pool()
+        try:
+            futures = [pool.submit(_run_one, strategy, p, initial_cash, cost_bps, close) for p in grid]
+            runs = [f.result() for f in futures]
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next request
+            _reset_pool()
+            raise
+
+    equity = pd.DataFrame({i: run['equity'] for i, run in enumerate(runs)})
+    stats = user_performance(equity, periods_per_year=TRADING_DAYS)
+    results = []
+    for i, run in enumerate(runs):
+        results.append({
+            'params': run['params'],
+            'final_equity': round(float(run['equity'].iloc[-1]), 2),
+            'total_return': float(stats.at[i, 'twr']),
+            'max_drawdown': float(stats.at[i, 'max_drawdown']),
+            'sharpe': None if np.isnan(stats.at[i, 'sharpe']) else float(stats.at[i, 'sharpe']),
+            'trades': run['trades'],
+            'turnover': run['turnover'],
+            'cash': round(run['cash'], 2),
+            'positions': run['positions'],
+        })
+
+    best = max(range(len(results)), key=lambda i: results[i]['total_return'])
+    curve = runs[best]['equity']
+    return {
+        'symbols': list(close.columns),
+        'missing_symbols': sorted(set(symbols) - set(close.columns)),
+        'start': close.index[0].date().isoformat(),
+        'end': close.index[-1].date().isoformat(),
+        'strategy': strategy,
+        'results': results,
+        'best': best,
+        'equity_curve': [
+            {"time": str(index.date()), "equity": round(float(value), 2)}
+            for index, value in curve.items()
+        ],
+    }
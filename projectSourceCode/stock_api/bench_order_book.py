@@ -0,0 +1,106 @@
+"""
+Replay benchmark for the order book.
+
+Rests a batch of random limit/stop orders, then feeds random-walk price ticks
+through OrderBook.on_tick and through a naive scan over every open order, and
+checks both trigger the same orders.
+
+    python3 stock_api/bench_order_book.py --orders 100000 --ticks 50000
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from orders import Order, OrderBook, ORDER_TYPES, SIDES
+
+
+def make_orders(n, symbols, start_prices, rng):
+    orders = []
+    for i in range(n):
+        symbol = rng.choice(symbols)
+        trigger = start_prices[symbol] * Decimal(str(round(rng.uniform(0.8, 1.2), 4)))
+        orders.append(Order(
+            order_id=str(i),
+            user_id=str(rng.randrange(1000)),
+            symbol=symbol,
+            side=rng.choice(SIDES),
+            order_type=rng.choice(ORDER_TYPES),
+            quantity=Decimal(rng.randint(1, 100)),
+            trigger_price=trigger.quantize(Decimal('0.01'))
+        ))
+    return orders
+
+
+def make_ticks(n, symbols, start_prices, rng):
+    prices = dict(start_prices)
+    ticks = []
+    for _ in range(n):
+        symbol = rng.choice(symbols)
+        step = Decimal(str(round(rng.gauss(0, 0.002), 5)))
+        prices[symbol] = (prices[symbol] * (1 + step)).quantize(Decimal('0.01'))
+        ticks.append((symbol, prices[symbol]))
+    return ticks
+
+
+def naive_on_tick(open_orders, symbol, price):
+    triggered = []
+    for order_id, order in list(open_orders.items()):
+        if order.symbol != symbol:
+            continue
+        if order.triggers_on_rise:
+            crossed = price >= order.trigger_price
+        else:
+            crossed = price <= order.trigger_price
+        if crossed:
+            triggered.append(order)
+            del open_orders[order_id]
+    return triggered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Order book replay benchmark")
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--ticks', type=int, default=20000)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=3308)
+    parser.add_argument('--skip-naive', action='store_true')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f'SYM{i}' for i in range(args.symbols)]
+    start_prices = {s: Decimal(rng.randint(10, 500)) for s in symbols}
+    orders = make_orders(args.orders, symbols, start_prices, rng)
+    ticks = make_ticks(args.ticks, symbols, start_prices, rng)
+
+    book = OrderBook()
+    start = time.perf_counter()
+    for order in orders:
+        book.add(order)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    book_fills = [order.order_id for symbol, price in ticks for order in book.on_tick(symbol, price)]
+    book_time = time.perf_counter() - start
+
+    print(f"{args.orders} orders, {args.ticks} ticks, {args.symbols} symbols")
+    print(f"order book: load {load_time:.3f}s, replay {book_time:.3f}s "
+          f"({args.ticks / book_time:,.0f} ticks/s), {len(book_fills)} fills")
+
+    if args.skip_naive:
+        return
+
+    open_orders = {order.order_id: order for order in orders}
+    start = time.perf_counter()
+    naive_fills = [order.order_id for symbol, price in ticks
+                   for order in naive_on_tick(open_orders, symbol, price)]
+    naive_time = time.perf_counter() - start
+
+    print(f"naive scan: replay {naive_time:.3f}s "
+          f"({args.ticks / naive_time:,.0f} ticks/s), {len(naive_fills)} fills")
+    print(f"speedup: {naive_time / book_time:.1f}x")
+    assert sorted(book_fills) == sorted(naive_fills), "order book and naive scan disagree"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Startup-time benchmark for the stock API.
+
+Measures how long `import server` takes with the lazy imports versus forcing
+yfinance/pandas/backtest in, then boots the server in the default (debug
+reloader, warm before serving) and fast-start modes and times how long each
+takes to answer /api/ready and to finish warming up.
+
+    python3 stock_api/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_import(code, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=HERE, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def poll_ready(port):
+    """Return the /api/ready payload, or None while nothing is listening"""
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ready', timeout=1) as res:
+            return json.load(res)
+    except urllib.error.HTTPError as e:
+        # 503 still means we're serving, just not warmed yet
+        return json.load(e)
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None
+
+
+def time_boot(fast_start, port, timeout):
+    env = dict(os.environ, FAST_START='true' if fast_start else 'false', PORT=str(port))
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'server.py'], cwd=HERE, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_response = warmed = None
+    try:
+        while time.perf_counter() - start < timeout:
+            payload = poll_ready(port)
+            if payload is not None and first_response is None:
+                first_response = time.perf_counter() - start
+            if payload is not None and payload.get('warmed'):
+                warmed = time.perf_counter() - start
+                break
+            time.sleep(0.05)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return first_response, warmed
+
+
+def fmt(seconds):
+    return 'timeout' if seconds is None else f'{seconds:.2f}s'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock API startup benchmark")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    lazy = time_import('import server', args.runs)
+    eager = time_import('import server, yfinance, backtest', args.runs)
+    print(f"import server (lazy):  {lazy:.2f}s")
+    print(f"import server (eager): {eager:.2f}s")
+
+    # Separate ports so a straggling reloader child can't answer for the next run
+    for offset, fast_start in enumerate((False, True)):
+        label = 'fast-start' if fast_start else 'default'
+        first, warmed = time_boot(fast_start, args.port + offset, args.timeout)
+        print(f"{label:>10}: first response {fmt(first)}, warmed {fmt(warmed)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+In-memory order book for resting limit and stop orders.
+
+Each symbol keeps two heaps keyed by trigger price:
+
+- rising:  orders that fire once the price climbs to the trigger
+           (SELL LIMIT, BUY STOP) -- min-heap, lowest trigger on top
+- falling: orders that fire once the price drops to the trigger
+           (BUY LIMIT, SELL STOP) -- max-heap, highest trigger on top
+
+A price tick only pops the orders it crosses, so it costs O(k log n) for k
+triggered orders instead of a scan over every open order. Cancelled orders
+are dropped lazily when they reach the top of a heap.
+
+The book holds no database state; server.py persists orders and fills them.
+"""
+import heapq
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+from itertools import count
+
+ORDER_TYPES = ('LIMIT', 'STOP')
+SIDES = ('BUY', 'SELL')
+
+
+@dataclass
+class Order:
+    order_id: str
+    user_id: str
+    symbol: str
+    side: str
+    order_type: str
+    quantity: Decimal
+    trigger_price: Decimal
+
+    @property
+    def triggers_on_rise(self):
+        return (self.side, self.order_type) in (('SELL', 'LIMIT'), ('BUY', 'STOP'))
+
+
+class OrderBook:
+    def __init__(self):
+        self._rising = defaultdict(list)
+        self._falling = defaultdict(list)
+        self._open = {}
+        self._seq = count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._open)
+
+    def __contains__(self, order_id):
+        return order_id in self._open
+
+    def add(self, order):
+        """Rest an order on the book; returns False if it was already resting"""
+        with self._lock:
+            if order.order_id in self._open:
+                return False
+            self._open[order.order_id] = order
+            # seq keeps same-price orders in arrival order
+            seq = next(self._seq)
+            if order.triggers_on_rise:
+                heapq.heappush(self._rising[order.symbol], (order.trigger_price, seq, order.order_id))
+            else:
+                heapq.heappush(self._falling[order.symbol], (-order.trigger_price, seq, order.order_id))
+            return True
+
+    def cancel(self, order_id):
+        """Remove an order; returns False if it was not open"""
+        with self._lock:
+            return self._open.pop(order_id, None) is not None
+
+    def symbols(self):
+        """Symbols that still have open orders"""
+        with self._lock:
+            return sorted({order.symbol for order in self._open.values()})
+
+    def on_tick(self, symbol, price):
+        """Pop and return every open order on symbol crossed by price"""
+        price = Decimal(str(price))
+        triggered = []
+        with self._lock:
+            rising = self._rising.get(symbol)
+            while rising and rising[0][0] <= price:
+                _, _, order_id = heapq.heappop(rising)
+                order = self._open.pop(order_id, None)
+                if order is not None:
+                    triggered.append(order)
+
+            falling = self._falling.get(symbol)
+            while falling and -falling[0][0] >= price:
+                _, _, order_id = heapq.heappop(falling)
+                order = self._open.pop(order_id, None)
+                if order is not None:
+                    triggered.append(order)
+
+            # Drop cancelled entries sitting on top so empty symbols free up
+            for heap in (rising, falling):
+                while heap and heap[0][2] not in self._open:
+                    heapq.heappop(heap)
+            if not rising:
+                self._rising.pop(symbol, None)
+            if not falling:
+                self._falling.pop(symbol, None)
+
+        return triggered
@@ -8,8 +8,32 @@ from psycopg2.extras import RealDictCursor
 import os
 from datetime import datetime, timezone
 from decimal import Decimal
+import importlib
 import logging
-import yfinance as yf
+import threading
+import time
+import uuid
+
+from orders import Order, OrderBook, ORDER_TYPES, SIDES
+
+class LazyModule:
+    """Stand-in for a heavy module that imports it on first attribute access"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def is_loaded(self):
+        return self._module is not None
+
+# yfinance drags in pandas, numpy and requests; backtest adds pyarrow.
+# Only the routes that need them pay for the import.
+yf = LazyModule('yfinance')
+backtest = LazyModule('backtest')
 
 app = Flask(__name__)
 CORS(app)
@@ -25,7 +49,9 @@ def log_request_info():
     logger.debug('Body: %s', request.get_data())
     logger.debug('Method: %s, Path: %s', request.method, request.path)
 
-PORT = 8000
+PORT = int(os.getenv('PORT', '8000'))
+# Skip the debug reloader and warm up in the background while already serving
+FAST_START = os.getenv('FAST_START', 'false').lower() == 'true'
 
 # Database connection
 def get_db_connection():
@@ -60,6 +86,23 @@ def get_price(symbol):
         return jsonify({ 'error': 'Symbol not found or price unavailable' }), 404
     return jsonify({ 'price': float(price) })
 
+def get_or_create_stock_id(cur, symbol, current_price):
+    """Look up a stock's ID, creating the stock entry if we haven't seen it yet"""
+    cur.execute("SELECT stock_id FROM stocks WHERE symbol = %s", (symbol,))
+    stock_result = cur.fetchone()
+    
+    if not stock_result:
+        # Stock doesn't exist in our database, create it
+        stock = yf.Ticker(symbol)
+        info = stock.info
+        cur.execute(
+            "INSERT INTO stocks (symbol, company_name, last_price) VALUES (%s, %s, %s) RETURNING stock_id",
+            (symbol, info.get("shortName"), current_price)
+        )
+        stock_result = cur.fetchone()
+    
+    return stock_result['stock_id']
+
 def validate_trade(conn, user_id, symbol, quantity, trade_type):
     """Validate if a trade can be executed"""
     cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -71,20 +114,7 @@ def validate_trade(conn, user_id, symbol, quantity, trade_type):
             return False, "Unable to get current stock price", None, None
         
         # Get stock ID or create new stock entry
-        cur.execute("SELECT stock_id FROM stocks WHERE symbol = %s", (symbol,))
-        stock_result = cur.fetchone()
-        
-        if not stock_result:
-            # Stock doesn't exist in our database, create it
-            stock = yf.Ticker(symbol)
-            info = stock.info
-            cur.execute(
-                "INSERT INTO stocks (symbol, company_name, last_price) VALUES (%s, %s, %s) RETURNING stock_id",
-                (symbol, info.get("shortName"), current_price)
-            )
-            stock_result = cur.fetchone()
-        
-        stock_id = stock_result['stock_id']
+        stock_id = get_or_create_stock_id(cur, symbol, current_price)
         
         # Get user's current balance
         cur.execute("SELECT balance FROM users WHERE user_id = %s", (user_id,))
@@ -114,6 +144,54 @@ def validate_trade(conn, user_id, symbol, quantity, trade_type):
     finally:
         cur.close()
 
+def execute_trade(cur, user_id, stock_id, trade_type, quantity, price):
+    """Apply a fill to the user's balance and holdings and record the transaction"""
+    total_amount = price * quantity
+
+    if trade_type == 'BUY':
+        # Update user's balance
+        cur.execute(
+            "UPDATE users SET balance = balance - %s WHERE user_id = %s",
+            (total_amount, user_id)
+        )
+
+        # Update or insert holdings
+        cur.execute("""
+            INSERT INTO holdings (user_id, stock_id, quantity)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (user_id, stock_id)
+            DO UPDATE SET quantity = holdings.quantity + %s
+        """, (user_id, stock_id, quantity, quantity))
+
+    else:  # SELL
+        # Update user's balance
+        cur.execute(
+            "UPDATE users SET balance = balance + %s WHERE user_id = %s",
+            (total_amount, user_id)
+        )
+
+        # Update holdings
+        cur.execute("""
+            UPDATE holdings 
+            SET quantity = quantity - %s
+            WHERE user_id = %s AND stock_id = %s
+        """, (quantity, user_id, stock_id))
+
+        # Remove holding if quantity is 0
+        cur.execute("""
+            DELETE FROM holdings
+            WHERE user_id = %s AND stock_id = %s AND quantity <= 0
+        """, (user_id, stock_id))
+
+    # Record the transaction
+    cur.execute("""
+        INSERT INTO transactions 
+        (user_id, stock_id, transaction_type, quantity, price)
+        VALUES (%s, %s, %s, %s, %s)
+    """, (user_id, stock_id, trade_type, quantity, price))
+
+    return total_amount
+
 @app.route('/api/trade', methods=['POST'])
 def handle_trade():
     print("\n=== Trade Request Started ===")
@@ -193,49 +271,9 @@ def handle_trade():
             print("Transaction started")
             
             try:
-                total_amount = current_price * quantity
-                
-                if trade_type == 'BUY':
-                    # Update user's balance
-                    cur.execute(
-                        "UPDATE users SET balance = balance - %s WHERE user_id = %s",
-                        (total_amount, user_id)
-                    )
-                    
-                    # Update or insert holdings
-                    cur.execute("""
-                        INSERT INTO holdings (user_id, stock_id, quantity)
-                        VALUES (%s, %s, %s)
-                        ON CONFLICT (user_id, stock_id)
-                        DO UPDATE SET quantity = holdings.quantity + %s
-                    """, (user_id, stock_id, quantity, quantity))
-                    
-                else:  # SELL
-                    # Update user's balance
-                    cur.execute(
-                        "UPDATE users SET balance = balance + %s WHERE user_id = %s",
-                        (total_amount, user_id)
-                    )
-                    
-                    # Update holdings
-                    cur.execute("""
-                        UPDATE holdings 
-                        SET quantity = quantity - %s
-                        WHERE user_id = %s AND stock_id = %s
-                    """, (quantity, user_id, stock_id))
-                    
-                    # Remove holding if quantity is 0
-                    cur.execute("""
-                        DELETE FROM holdings
-                        WHERE user_id = %s AND stock_id = %s AND quantity <= 0
-                    """, (user_id, stock_id))
-                
-                # Record the transaction
-                cur.execute("""
-                    INSERT INTO transactions 
-                    (user_id, stock_id, transaction_type, quantity, price)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (user_id, stock_id, trade_type, quantity, current_price))
+                total_amount = execute_trade(
+                    cur, user_id, stock_id, trade_type, quantity, current_price
+                )
                 
                 # Commit transaction
                 cur.execute("COMMIT")
@@ -265,6 +303,275 @@ def handle_trade():
     finally:
         print("=== Trade Request Ended ===\n")
 
+# Resting limit/stop orders
+order_book = OrderBook()
+ORDER_POLL_SECONDS = int(os.getenv('ORDER_POLL_SECONDS', '15'))
+
+def load_open_orders():
+    """Rebuild the in-memory order book from OPEN rows in the orders table"""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute("""
+            SELECT o.order_id, o.user_id, s.symbol, o.side, o.order_type,
+                   o.quantity, o.trigger_price
+            FROM orders o
+            JOIN stocks s ON o.stock_id = s.stock_id
+            WHERE o.status = 'OPEN'
+        """)
+        for row in cur.fetchall():
+            order_book.add(Order(
+                order_id=str(row['order_id']),
+                user_id=str(row['user_id']),
+                symbol=row['symbol'],
+                side=row['side'],
+                order_type=row['order_type'],
+                quantity=Decimal(str(row['quantity'])),
+                trigger_price=Decimal(str(row['trigger_price']))
+            ))
+    finally:
+        cur.close()
+        conn.close()
+
+def fill_order(order, price):
+    """Fill a triggered order at price; returns the order's final status"""
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cur.execute(
+            "SELECT status, stock_id FROM orders WHERE order_id = %s FOR UPDATE",
+            (order.order_id,)
+        )
+        row = cur.fetchone()
+        if not row or row['status'] != 'OPEN':
+            conn.rollback()
+            return row['status'] if row else None
+
+        stock_id = row['stock_id']
+        cur.execute("SELECT balance FROM users WHERE user_id = %s FOR UPDATE", (order.user_id,))
+        user = cur.fetchone()
+
+        if order.side == 'BUY':
+            can_fill = user and Decimal(str(user['balance'])) >= price * order.quantity
+        else:
+            cur.execute(
+                "SELECT quantity FROM holdings WHERE user_id = %s AND stock_id = %s FOR UPDATE",
+                (order.user_id, stock_id)
+            )
+            holding = cur.fetchone()
+            can_fill = holding and Decimal(str(holding['quantity'])) >= order.quantity
+
+        if not can_fill:
+            cur.execute("UPDATE orders SET status = 'REJECTED' WHERE order_id = %s", (order.order_id,))
+            conn.commit()
+            return 'REJECTED'
+
+        execute_trade(cur, order.user_id, stock_id, order.side, order.quantity, price)
+        cur.execute("""
+            UPDATE orders
+            SET status = 'FILLED', filled_price = %s, filled_at = CURRENT_TIMESTAMP
+            WHERE order_id = %s
+        """, (price, order.order_id))
+        conn.commit()
+        return 'FILLED'
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+def process_tick(symbol, price):
+    """Fill every open order on symbol that price crosses"""
+    for order in order_book.on_tick(symbol, price):
+        try:
+            status = fill_order(order, price)
+            logger.info(f"Order {order.order_id} {order.side} {order.order_type} {symbol} @ {price}: {status}")
+        except Exception as e:
+            # Leave it resting so the next tick retries the fill
+            logger.warning(f"Failed to fill order {order.order_id}: {e}")
+            order_book.add(order)
+
+def poll_open_orders():
+    while True:
+        for symbol in order_book.symbols():
+            price = get_stock_price(symbol)
+            if price:
+                process_tick(symbol, price)
+        time.sleep(ORDER_POLL_SECONDS)
+
+order_engine_thread = None
+
+def start_order_engine():
+    global order_engine_thread
+    # Safe to call again after a failed load; the poller only starts once
+    if order_engine_thread is None:
+        order_engine_thread = threading.Thread(target=poll_open_orders, name='order-engine', daemon=True)
+        order_engine_thread.start()
+    load_open_orders()
+
+@app.route('/api/orders', methods=['POST'])
+def place_order():
+    data = request.get_json(silent=True)
+    if data is None:
+        return jsonify({"error": "No JSON data provided"}), 400
+
+    required_fields = ['user_id', 'symbol', 'quantity', 'side', 'order_type', 'trigger_price']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({"error": f"Missing required fields: {missing_fields}"}), 400
+
+    user_id = data['user_id']
+    symbol = str(data['symbol']).upper()
+    side = str(data['side']).upper()
+    order_type = str(data['order_type']).upper()
+    try:
+        quantity = Decimal(str(data['quantity']))
+        trigger_price = Decimal(str(data['trigger_price']))
+        if not (quantity.is_finite() and trigger_price.is_finite()):
+            raise ValueError("non-finite value")
+        # Match the orders columns so the book fires on the stored price
+        quantity = quantity.quantize(Decimal('0.0001'))
+        trigger_price = trigger_price.quantize(Decimal('0.01'))
+    except (TypeError, ValueError, ArithmeticError):
+        return jsonify({"error": "Invalid quantity or trigger price"}), 400
+
+    if not all([user_id, symbol, quantity > 0, trigger_price > 0,
+                side in SIDES, order_type in ORDER_TYPES]):
+        return jsonify({"error": "Invalid order parameters"}), 400
+
+    current_price = get_stock_price(symbol)
+    if not current_price:
+        return jsonify({"error": "Symbol not found"}), 404
+
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        return jsonify({"error": "Database connection failed"}), 500
+
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        stock_id = get_or_create_stock_id(cur, symbol, current_price)
+
+        cur.execute("SELECT balance FROM users WHERE user_id = %s", (user_id,))
+        user = cur.fetchone()
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        # Checked again at fill time, since the account can change while the order rests
+        if side == 'BUY':
+            if trigger_price * quantity > Decimal(str(user['balance'])):
+                return jsonify({"error": "Insufficient funds"}), 400
+        else:
+            cur.execute(
+                "SELECT quantity FROM holdings WHERE user_id = %s AND stock_id = %s",
+                (user_id, stock_id)
+            )
+            holding = cur.fetchone()
+            if not holding or Decimal(str(holding['quantity'])) < quantity:
+                return jsonify({"error": "Insufficient shares"}), 400
+
+        cur.execute("""
+            INSERT INTO orders (user_id, stock_id, side, order_type, quantity, trigger_price)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING order_id, status, created_at
+        """, (user_id, stock_id, side, order_type, quantity, trigger_price))
+        row = cur.fetchone()
+        conn.commit()
+
+        order_id = str(row['order_id'])
+        order_book.add(Order(order_id, str(user_id), symbol, side, order_type, quantity, trigger_price))
+
+        return jsonify({
+            "success": True,
+            "order_id": order_id,
+            "status": row['status'],
+            "created_at": row['created_at'].isoformat()
+        }), 201
+
+    except Exception as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+@app.route('/api/orders/<user_id>')
+def get_orders(user_id):
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+
+        cur.execute("""
+            SELECT
+                o.order_id,
+                s.symbol,
+                o.side,
+                o.order_type,
+                o.quantity,
+                o.trigger_price,
+                o.status,
+                o.filled_price,
+                o.created_at,
+                o.filled_at
+            FROM orders o
+            JOIN stocks s ON o.stock_id = s.stock_id
+            WHERE o.user_id = %s
+            ORDER BY o.created_at DESC
+        """, (user_id,))
+        orders = cur.fetchall()
+
+        cur.close()
+        conn.close()
+
+        return jsonify(orders)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/orders/<order_id>', methods=['DELETE'])
+def cancel_order(order_id):
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id') or request.args.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Missing required fields: ['user_id']"}), 400
+
+    try:
+        user_id = str(uuid.UUID(str(user_id)))
+    except ValueError:
+        return jsonify({"error": "Invalid user_id"}), 400
+    try:
+        # Normalized so it matches the order book's keys
+        order_id = str(uuid.UUID(order_id))
+    except ValueError:
+        return jsonify({"error": "Order not found or no longer open"}), 404
+
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+
+        # Only the order's owner can cancel it
+        cur.execute("""
+            UPDATE orders SET status = 'CANCELLED'
+            WHERE order_id = %s AND user_id = %s AND status = 'OPEN'
+            RETURNING order_id
+        """, (order_id, user_id))
+        cancelled = cur.fetchone()
+        conn.commit()
+
+        cur.close()
+        conn.close()
+
+        if not cancelled:
+            return jsonify({"error": "Order not found or no longer open"}), 404
+
+        order_book.cancel(order_id)
+        return jsonify({"success": True, "order_id": order_id, "status": "CANCELLED"})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/holdings/<user_id>')
 def get_holdings(user_id):
     try:
@@ -494,6 +801,75 @@ def get_holdings1():
     finally:
         session.close()
 
+# Startup warm-up, reported by /api/ready
+readiness = {
+    "started_at": time.time(),
+    "warmed": False,
+    "components": {}
+}
+
+def check_database():
+    conn = get_db_connection()
+    conn.close()
+
+# (name, step, required). Optional steps are reported by /api/ready but don't
+# gate it, so the backtest feature can't hold the price/trade routes hostage.
+# The backtest worker pool isn't warmed here; it starts on the first sweep.
+WARM_UP_STEPS = [
+    ('yfinance', lambda: yf.Ticker, True),
+    ('database', check_database, True),
+    ('order_engine', start_order_engine, True),
+    ('backtest', lambda: backtest.run_backtest, False),
+    ('history_cache', lambda: backtest.check_cache(), False),
+]
+WARM_UP_MAX_BACKOFF = 60
+
+def warm_up(steps=WARM_UP_STEPS):
+    """Run warm-up steps once, recording each in readiness; returns the ones that failed"""
+    failed = []
+    for name, step, required in steps:
+        started = time.time()
+        attempts = readiness['components'].get(name, {}).get('attempts', 0) + 1
+        component = {"status": "ok", "required": required}
+        try:
+            detail = step()
+            # Steps that return a count (cached symbols, pool workers) report it
+            if isinstance(detail, int):
+                component['count'] = detail
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            component['status'] = f"error: {e}"
+            failed.append((name, step, required))
+        component['seconds'] = round(time.time() - started, 3)
+        component['attempts'] = attempts
+        readiness['components'][name] = component
+    readiness['warmed'] = True
+    return failed
+
+def retry_warm_up(failed):
+    """Keep retrying failed steps with exponential backoff, e.g. while the database boots"""
+    delay = 1
+    while failed:
+        time.sleep(delay)
+        delay = min(delay * 2, WARM_UP_MAX_BACKOFF)
+        failed = warm_up(failed)
+
+@app.route('/api/ready')
+def ready():
+    components = dict(readiness['components'])
+    is_ready = readiness['warmed'] and all(
+        c['status'] == 'ok' for c in components.values() if c['required']
+    )
+    # Only look at the pool if something already imported backtest
+    if backtest.is_loaded():
+        components['backtest_pool'] = dict(backtest.pool_status(), required=False)
+    return jsonify({
+        "ready": is_ready,
+        "warmed": readiness['warmed'],
+        "uptime": round(time.time() - readiness['started_at'], 3),
+        "components": components
+    }), 200 if is_ready else 503
+
 @app.route('/api/market-status', methods=['GET'])
 def market_status():
     try:
@@ -598,6 +974,46 @@ def handle_history_request():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/backtest', methods=['POST'])
+def handle_backtest_request():
+    data = request.get_json(silent=True)
+    if data is None:
+        return jsonify({"error": "No JSON data provided"}), 400
+
+    required_fields = ['symbols', 'start', 'end', 'strategy']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({"error": f"Missing required fields: {missing_fields}"}), 400
+
+    try:
+        start = datetime.strptime(data['start'], '%Y-%m-%d').date()
+        end = datetime.strptime(data['end'], '%Y-%m-%d').date()
+        initial_cash = float(data.get('initial_cash', 10000))
+        cost_bps = float(data.get('cost_bps', 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Dates must be YYYY-MM-DD and amounts numeric"}), 400
+
+    symbols = data['symbols']
+    if isinstance(symbols, str):
+        symbols = symbols.split(',')
+    if not isinstance(symbols, list):
+        return jsonify({"error": "symbols must be a list or comma-separated string"}), 400
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({"error": "params must be an object"}), 400
+
+    try:
+        result = backtest.run_backtest(
+            symbols, start, end,
+            data['strategy'], params, initial_cash, cost_bps
+        )
+        return jsonify(result)
+    except (backtest.BacktestError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.warning(f"Backtest failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/search')
 def handle_search_request():
     query = request.args.get('query', '').strip().lower()
@@ -708,4 +1124,13 @@ def serve_static(path):
     return send_from_directory('.', path)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    if FAST_START:
+        threading.Thread(target=lambda: retry_warm_up(warm_up()), name='warm-up', daemon=True).start()
+        app.run(host='0.0.0.0', port=PORT, debug=False)
+    else:
+        # With the debug reloader on, only the child process that serves requests warms up.
+        # The first pass finishes before serving; retries happen in the background.
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            failed = warm_up()
+            threading.Thread(target=retry_warm_up, args=(failed,), name='warm-up', daemon=True).start()
+        app.run(host='0.0.0.0', port=PORT, debug=True)
\ No newline at end of file
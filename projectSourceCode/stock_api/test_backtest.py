@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+
+
+def make_close(**columns):
+    dates = pd.bdate_range('2024-01-01', periods=len(next(iter(columns.values()))))
+    return pd.DataFrame(columns, index=dates, dtype=float)
+
+
+def test_buy_and_hold_drifts_without_rebalancing():
+    close = make_close(A=[100, 200, 100], B=[100, 100, 100])
+    result = backtest.simulate(close, backtest.buy_and_hold(close), 10000.0, cost_bps=10)
+
+    # One entry trade at day 0: 10 bps on 10000, then 49.95 shares of each
+    assert result['equity'].tolist() == pytest.approx([9990.0, 14985.0, 9990.0])
+    assert result['positions'] == {'A': 49.95, 'B': 49.95}
+    assert result['cash'] == pytest.approx(0.0)
+    assert result['turnover'] == pytest.approx(1.0)
+    assert result['trades'] == 2
+
+
+def test_rebalance_charges_drifted_gap():
+    close = make_close(A=[100, 200, 200], B=[100, 100, 100])
+    weights = np.array([[0.5, 0.5], [0.5, 0.5], [0.0, 1.0]])
+    result = backtest.simulate(close, weights, 10000.0, cost_bps=0)
+
+    # By day 2 A has drifted to 2/3 of equity; moving all of it into B trades 4/3
+    assert result['equity'].tolist() == pytest.approx([10000.0, 15000.0, 15000.0])
+    assert result['positions'] == {'B': 150.0}
+    assert result['turnover'] == pytest.approx(1.0 + 4 / 3)
+    assert result['trades'] == 4
+
+
+def test_momentum_holds_between_rebalance_days():
+    close = make_close(A=[100, 110, 120, 130, 140, 150], B=[100, 90, 80, 70, 60, 50])
+    weights = backtest.momentum(close, lookback=1, top_n=1, rebalance=3)
+    result = backtest.simulate(close, weights, 1000.0)
+
+    # Day 0 has no trailing return yet, so the first pick happens on day 3
+    assert weights.tolist() == [[0.0, 0.0]] * 3 + [[1.0, 0.0]] * 3
+    assert result['trades'] == 1
+    assert result['equity'].iloc[-1] == pytest.approx(1000.0 * 150 / 130)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'symbols': ['../x']},
+    {'symbols': [1, 2]},
+    {'initial_cash': 0.0},
+    {'initial_cash': float('nan')},
+    {'cost_bps': -1.0},
+])
+def test_run_backtest_rejects_bad_input(kwargs):
+    args = {'symbols': ['AAPL'], 'initial_cash': 10000.0, 'cost_bps': 0.0, **kwargs}
+    with pytest.raises(backtest.BacktestError):
+        backtest.run_backtest(args['symbols'], pd.Timestamp('2020-01-01').date(),
+                              pd.Timestamp('2021-01-01').date(), 'buy_and_hold',
+                              initial_cash=args['initial_cash'], cost_bps=args['cost_bps'])
+
+
+def test_signals_trade_the_day_after():
+    close = make_close(A=[100, 110, 120, 130, 140, 150], B=[100, 90, 80, 70, 60, 50])
+    signal = backtest.momentum(close, lookback=1, top_n=1, rebalance=3)
+    weights = backtest.target_weights(close, 'momentum', {'lookback': 1, 'top_n': 1, 'rebalance': 3})
+
+    assert weights[0].tolist() == [0.0, 0.0]
+    assert weights[1:].tolist() == signal[:-1].tolist()
+    # Picked A at day 3's close (130), bought at day 4's (140)
+    result = backtest.simulate(close, weights, 1000.0)
+    assert result['equity'].iloc[-1] == pytest.approx(1000.0 * 150 / 140)
+
+
+@pytest.mark.parametrize('params', [
+    {'fast': 'abc'},
+    {'fast': float('inf')},
+    {'fast': []},
+    {'speed': 3},
+])
+def test_run_backtest_rejects_bad_params(params, monkeypatch):
+    monkeypatch.setattr(backtest, 'load_history', lambda *a: pytest.fail("should not load history"))
+    with pytest.raises(backtest.BacktestError):
+        backtest.run_backtest(['AAPL'], pd.Timestamp('2020-01-01').date(),
+                              pd.Timestamp('2021-01-01').date(), 'sma_crossover', params)
+
+
+def test_empty_download_is_not_cached_as_covered(tmp_path, monkeypatch):
+    monkeypatch.setattr(backtest, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(backtest, '_no_data', {})
+    idx = pd.bdate_range('2020-01-01', '2020-12-31')
+    responses = [{}, {'AAPL': pd.DataFrame({c: 1.0 for c in backtest.OHLCV}, index=idx)}]
+    calls = []
+
+    def fake_download(symbols, start, end):
+        calls.append(symbols)
+        return responses.pop(0)
+
+    monkeypatch.setattr(backtest, '_download', fake_download)
+    start, end = pd.Timestamp('2020-01-01').date(), pd.Timestamp('2020-12-31').date()
+
+    assert backtest.load_history(['AAPL'], start, end) == {}
+    assert not (tmp_path / 'AAPL.parquet').exists()
+    # Within the TTL the empty answer is remembered
+    assert backtest.load_history(['AAPL'], start, end) == {}
+    assert len(calls) == 1
+
+    monkeypatch.setattr(backtest, '_no_data', {})
+    assert len(backtest.load_history(['AAPL'], start, end)['AAPL']) == len(idx)
+    assert len(backtest.load_history(['AAPL'], start, end)['AAPL']) == len(idx)
+    assert len(calls) == 2
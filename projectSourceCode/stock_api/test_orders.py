@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+import pytest
+
+from orders import Order, OrderBook
+
+
+def make_order(order_id, side, order_type, trigger, symbol='AAPL'):
+    return Order(order_id, 'user', symbol, side, order_type, Decimal('1'), Decimal(str(trigger)))
+
+
+def ids(orders):
+    return [order.order_id for order in orders]
+
+
+@pytest.mark.parametrize('side, order_type, trigger, miss, hit', [
+    # Fire when the price climbs to the trigger
+    ('SELL', 'LIMIT', 110, 109, 110),
+    ('BUY', 'STOP', 110, 109, 111),
+    # Fire when the price drops to the trigger
+    ('BUY', 'LIMIT', 90, 91, 90),
+    ('SELL', 'STOP', 90, 91, 89),
+])
+def test_trigger_directions(side, order_type, trigger, miss, hit):
+    book = OrderBook()
+    book.add(make_order('o1', side, order_type, trigger))
+
+    assert book.on_tick('AAPL', miss) == []
+    assert ids(book.on_tick('AAPL', hit)) == ['o1']
+    assert len(book) == 0
+    # Once filled it never fires again
+    assert book.on_tick('AAPL', hit) == []
+
+
+def test_tick_only_pops_crossed_orders_in_price_then_arrival_order():
+    book = OrderBook()
+    book.add(make_order('low', 'SELL', 'LIMIT', 101))
+    book.add(make_order('high', 'SELL', 'LIMIT', 105))
+    book.add(make_order('low-2', 'SELL', 'LIMIT', 101))
+    book.add(make_order('other', 'SELL', 'LIMIT', 50, symbol='MSFT'))
+
+    assert ids(book.on_tick('AAPL', 102)) == ['low', 'low-2']
+    assert 'high' in book and 'other' in book
+
+
+def test_cancelled_orders_are_dropped_lazily():
+    book = OrderBook()
+    book.add(make_order('o1', 'BUY', 'LIMIT', 90))
+    book.add(make_order('o2', 'BUY', 'LIMIT', 80))
+
+    assert book.cancel('o1') is True
+    assert book.cancel('o1') is False
+    assert 'o1' not in book
+    assert ids(book.on_tick('AAPL', 75)) == ['o2']
+    assert book.symbols() == []
+
+
+def test_readding_after_failed_fill_fires_again():
+    book = OrderBook()
+    order = make_order('o1', 'SELL', 'STOP', 90)
+    book.add(order)
+
+    assert ids(book.on_tick('AAPL', 89)) == ['o1']
+    assert book.add(order) is True
+    assert ids(book.on_tick('AAPL', 88)) == ['o1']
+
+
+def test_duplicate_add_is_ignored():
+    book = OrderBook()
+    order = make_order('o1', 'BUY', 'STOP', 110)
+
+    assert book.add(order) is True
+    assert book.add(order) is False
+    assert len(book) == 1
+    assert ids(book.on_tick('AAPL', 120)) == ['o1']
+    assert book.on_tick('AAPL', 120) == []